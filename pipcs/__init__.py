@@ -1,2 +1,2 @@
-from .pipcs import Config, Condition, Choices, Comparable, Required, required  # noqa
+from .pipcs import Config, Condition, Choices, Comparable, Required, required, freeze  # noqa
 from .pipcs import InvalidChoiceError, RequiredError  # noqa
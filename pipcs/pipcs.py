@@ -1,8 +1,10 @@
+import functools
 import os
+import operator
+import sys
 import types
-from dataclasses import dataclass
-from collections import abc
-from typing import Union, Type, TypeVar, Generic, List
+from collections import abc, namedtuple
+from typing import Union, Type, TypeVar, Generic, List, ClassVar
 
 
 class InvalidChoiceError(Exception):
@@ -32,52 +34,94 @@ class required:
 
 Required = Union[Type[required], T]
 
+# Incremented on every :class:`Config` mutation, cached results are only
+# valid while the version they were computed at is still current.
+_version = 0
+
+# Instance attributes holding results stamped with _version. The counter is
+# local to the process, so they are left out when a config is pickled.
+_CACHE_ATTRIBUTES = ('_dict_cache', '_checked_version', '_condition_cache')
+
+# Plain values that never need special handling while merging configs.
+_ATOMIC_TYPES = frozenset((int, float, bool, str, bytes, type(None)))
+
+
+def _touch():
+    global _version
+    _version += 1
+
+
+_AND = 'and'
+_OR = 'or'
+_NOT = 'not'
+
 
 class Comparison():
-    def __init__(self, comp):
-        self.comp = comp
+    """Node of a condition expression tree, evaluated against a :class:`pipcs.Config`."""
+    __slots__ = ('op', 'left', 'right')
+
+    def __init__(self, op, left, right=None):
+        self.op = op
+        self.left = left
+        self.right = right
 
     def __and__(self, other):
-        return Comparison(lambda config: self.comp(config) and other.comp(config))
+        return Comparison(_AND, self, other)
 
     def __or__(self, other):
-        return Comparison(lambda config: self.comp(config) or other.comp(config))
+        return Comparison(_OR, self, other)
 
     def __invert__(self):
-        return Comparison(lambda config: not self.comp(config))
+        return Comparison(_NOT, self)
 
     def __call__(self, config):
-        return self.comp(config)
+        op = self.op
+        if op is _AND:
+            return self.left(config) and self.right(config)
+        if op is _OR:
+            return self.left(config) or self.right(config)
+        if op is _NOT:
+            return not self.left(config)
+        right = self.right
+        if isinstance(right, Comparable):
+            right = right._get_value(config)
+        return op(self.left._get_value(config), right)
 
 
 class Comparable(Generic[T]):
+    __slots__ = ('data', '_name')
+
     def __init__(self, data: T):
         self.data = data
 
     def _get_value(self, config):
-        value = config.get_value(self._name)
+        value = dict.__getitem__(config, self._name)
         if isinstance(value, Comparable):
             return self.data
         else:
             return value
 
+    # Comparison operators build conditions instead of returning bools,
+    # keep identity hashing so variables can still be used in sets and dicts.
+    __hash__ = object.__hash__
+
     def __eq__(self, other):
-        return Comparison(lambda config: self._get_value(config) == other)
+        return Comparison(operator.eq, self, other)
 
     def __lt__(self, other):
-        return Comparison(lambda config: self._get_value(config) < other)
+        return Comparison(operator.lt, self, other)
 
     def __le__(self, other):
-        return Comparison(lambda config: self._get_value(config) <= other)
+        return Comparison(operator.le, self, other)
 
     def __ne__(self, other):
-        return Comparison(lambda config: self._get_value(config) != other)
+        return Comparison(operator.ne, self, other)
 
     def __gt__(self, other):
-        return Comparison(lambda config: self._get_value(config) > other)
+        return Comparison(operator.gt, self, other)
 
     def __ge__(self, other):
-        return Comparison(lambda config: self._get_value(config) >= other)
+        return Comparison(operator.ge, self, other)
 
 
 class Condition(Generic[T]):
@@ -130,6 +174,8 @@ class Condition(Generic[T]):
         print(user_config.example.to_dict())
         # {'variable': 1}
     """
+    __slots__ = ('data', 'comp')
+
     def __init__(self, data: T, comp: Comparison):
         self.data: T = data
         self.comp = comp
@@ -170,14 +216,26 @@ class Choices(Comparable, Generic[T]):
             variable = 4
         # Raises: pipcs.pipcs.InvalidChoiceError: 4 is not valid for variable, valid choices: [1, 2, 3]
     """
+    __slots__ = ('choices', '_choices_set')
+
     def __init__(self, choices: List[T], default=required):
+        self.choices: List[T] = choices
+        try:
+            self._choices_set = frozenset(choices)
+        except TypeError:
+            self._choices_set = choices
         if default is not required:
-            if default not in choices:
+            if not self._is_choice(default):
                 raise InvalidChoiceError('Default value is not in choices')
-        self.choices: List[T] = choices
         self.data: Required[T] = default
         super().__init__(self.data)
 
+    def _is_choice(self, value):
+        try:
+            return value in self._choices_set
+        except TypeError:
+            return value in self.choices
+
 
 class Config(dict):
     """Base class to create root configuration.
@@ -186,13 +244,64 @@ class Config(dict):
         dictionary (:obj:`Union[dict, Config]`, optional): If it is a :class:`pipcs.Config`,
                                                            it will inherit the base configuration.
     """
+    _name = None
+    _dict_cache = None
+    _checked_version = None
+    _condition_cache = None
+
     def __init__(self, dictionary={}):
         if isinstance(dictionary, Config):
-            self._name = dictionary._name
+            object.__setattr__(self, '_name', dictionary._name)
+            object.__setattr__(self, '__annotations__', dictionary.__annotations__)
         else:
-            self._name = None
+            object.__setattr__(self, '__annotations__', {})
         super(Config, self).__init__(dictionary)
 
+    # The version is bumped after each store, so a cache filled concurrently
+    # from the old contents is never stamped with a version that is still current.
+    def __setitem__(self, key, value):
+        super(Config, self).__setitem__(key, value)
+        _touch()
+
+    def __delitem__(self, key):
+        super(Config, self).__delitem__(key)
+        _touch()
+
+    def __ior__(self, other):
+        self.update(other)
+        return self
+
+    def update(self, *args, **kwargs):
+        try:
+            super(Config, self).update(*args, **kwargs)
+        finally:
+            _touch()
+
+    def setdefault(self, key, default=None):
+        value = super(Config, self).setdefault(key, default)
+        _touch()
+        return value
+
+    def pop(self, *args):
+        value = super(Config, self).pop(*args)
+        _touch()
+        return value
+
+    def popitem(self):
+        item = super(Config, self).popitem()
+        _touch()
+        return item
+
+    def clear(self):
+        super(Config, self).clear()
+        _touch()
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        for key in _CACHE_ATTRIBUTES:
+            state.pop(key, None)
+        return state
+
     def check_config(self):
         """Check configuration if all of the variables are valid.
 
@@ -208,26 +317,50 @@ class Config(dict):
 
             config.check_config()
             # Raises: pipcs.pipcs.RequiredError: variable is required!
+
+        A successful check is remembered until any configuration is modified.
         """
 
-        for k, v in self.items():
-            if isinstance(v, Config):
-                v.check_config()
-            else:
-                self.check_value(k, v)
+        version = _version
+        stack = [self]
+        checked = {}
+        while stack:
+            config = stack.pop()
+            if config._checked_version == version or id(config) in checked:
+                continue
+            checked[id(config)] = config
+            children = []
+            for k, v in dict.items(config):
+                if type(v) is Config:
+                    children.append(v)
+                else:
+                    config.check_value(k, v)
+            stack.extend(reversed(children))
+        for config in checked.values():
+            object.__setattr__(config, '_checked_version', version)
 
     def check_value(self, key, value):
-        if isinstance(value, Config):
-            value.check_config()
-        elif isinstance(value, Choices):
-            if value.data is required:
-                raise RequiredError(f'{key} is required!')
-        elif isinstance(value, Condition):
-            if value.comp(self):
-                if value.data is required:
-                    raise RequiredError(f'{key} is required!')
-        elif value is required:
+        if value is required:
             raise RequiredError(f'{key} is required!')
+        try:
+            handler = _CHECK_HANDLERS[type(value)]
+        except KeyError:
+            handler = _find_handler(_CHECK_HANDLERS, type(value))
+        if handler is not None:
+            handler(self, key, value)
+
+    def _holds(self, condition):
+        cache = self._condition_cache
+        if cache is None or cache[0] != _version:
+            cache = (_version, {})
+            object.__setattr__(self, '_condition_cache', cache)
+        results = cache[1]
+        comp = condition.comp
+        key = id(comp)
+        if key in results:
+            return results[key]
+        result = results[key] = comp(self)
+        return result
 
     def get_value(self, key, check=False):
         """
@@ -252,18 +385,18 @@ class Config(dict):
             print(config.example.get_value('variable', check=True))
             # pipcs.pipcs.RequiredError: variable is required!
         """
-        value = dict.__getitem__(self, key)
         if check:
-            check_value = object.__getattribute__(self, 'check_value')
-            check_value(key, value)
-        return value
+            return self._get_checked_value(key)
+        return dict.__getitem__(self, key)
 
-    def __getitem__(self, key):
-        return self.get_value(key)
+    def _get_checked_value(self, key):
+        value = dict.__getitem__(self, key)
+        self.check_value(key, value)
+        return value
 
     def __getattr__(self, key):
         try:
-            return self.get_value(key)
+            return dict.__getitem__(self, key)
         except KeyError:
             raise AttributeError(key)
 
@@ -279,56 +412,62 @@ class Config(dict):
 
         if check:
             self.check_config()
-        config_dict = {}
-        for k, v in self.items():
-            if k == '_name' or k == '__annotations__':
-                continue
+        config_dict = dict(self._cached_dict())
+        for k, v in dict.items(self):
             if isinstance(v, Config):
-                config_dict[k] = v.to_dict(check)
-            elif isinstance(v, Comparable):
-                config_dict[k] = v.data
-            elif isinstance(v, Condition):
-                if v.comp(self):
-                    config_dict[k] = v.data
-            else:
+                config_dict[k] = v.to_dict()
+        return config_dict
+
+    def _cached_dict(self):
+        # Shared with the parent configs' cached dicts, never hand it out directly.
+        cache = self._dict_cache
+        if cache is not None and cache[0] == _version:
+            return cache[1]
+        version = _version
+        config_dict = {}
+        handlers = _TO_DICT_HANDLERS
+        for k, v in dict.items(self):
+            try:
+                handler = handlers[type(v)]
+            except KeyError:
+                handler = _find_handler(handlers, type(v))
+            if handler is None:
                 config_dict[k] = v
+            else:
+                v = handler(self, v)
+                if v is not _SKIP:
+                    config_dict[k] = v
+        object.__setattr__(self, '_dict_cache', (version, config_dict))
         return config_dict
 
     def __setattr__(self, key, value):
-        self[key] = value
+        dict.__setitem__(self, key, value)
+        _touch()
 
     def add_config(self, cls, name, check=True):
-        if self.get(name):
-            parent = self.get_value(name)
-            config_class = type(cls.__name__, (Config,), dict(cls.__dict__))
-            members = [var for var in vars(config_class) if not var.startswith('__')]
-            if hasattr(config_class, '__annotations__'):
-                _annotations = {**parent.__annotations__, **config_class.__annotations__}
-            else:
-                _annotations = parent.__annotations__
+        namespace = vars(cls)
+        parent = dict.get(self, name)
+        if isinstance(parent, Config):
+            parent_annotations = parent.__annotations__
+            cls_annotations = namespace.get('__annotations__', {})
             annotations = {}
-            for member in members:
-                if member in _annotations:
-                    annotations[member] = _annotations[member]
-            config_class.__annotations__ = annotations
-            config_class._name = name
-            datacls = dataclass(config_class)()
-            datacls.__annotations__ = config_class.__annotations__
-            merged_config = parent.update_config(Config(datacls))
+            for member in namespace:
+                if member.startswith('__'):
+                    continue
+                if member in cls_annotations:
+                    annotations[member] = cls_annotations[member]
+                elif member in parent_annotations:
+                    annotations[member] = parent_annotations[member]
+            config = parent.update_config(_config_from_class(cls, name, annotations))
             if check:
-                merged_config.check_config()
-            self[name] = merged_config
+                config.check_config()
         else:
-            config_class = type(cls.__name__, (Config,), dict(cls.__dict__))
-            config_class._name = name
-            datacls = dataclass(config_class)()
-            datacls.__annotations__ = config_class.__annotations__
-            datacls = Config(datacls)
-            self[name] = datacls
-        for k, v in self[name].items():
+            config = _config_from_class(cls, name, namespace.get('__annotations__', {}))
+        self[name] = config
+        for k, v in dict.items(config):
             if isinstance(v, Comparable):
                 v._name = k
-        return self[name]
+        return config
 
     def add(self, name, check=True):
         def _add(wrapped_class):
@@ -339,35 +478,239 @@ class Config(dict):
     def __call__(self, name, check=True):
         return self.add(name, check)
 
-    def _update_comparables(self, other):
-        for k, v in other.items():
-            if isinstance(v, Config):
-                self[k]._update_comparables(v)
-            elif isinstance(self[k], Comparable):
-                self[k] = v.data
+    def _clone(self):
+        clone = Config.__new__(Config)
+        object.__setattr__(clone, '_name', self._name)
+        object.__setattr__(clone, '__annotations__', self.__annotations__)
+        dict.update(clone, self)
+        return clone
 
     def update_config(self, other):
-        newdict = Config(self)
-        for k, v in other.items():
-            newdict[k] = v
-            if hasattr(self, k):
-                if isinstance(self[k], Config):
-                    newdict[k] = self[k].update_config(v)
-                elif isinstance(self[k], abc.Mapping):
-                    newdict[k] = {**self[k], **v}
-                elif isinstance(self[k], Choices):
-                    if v not in self[k].choices:
-                        raise InvalidChoiceError(f'{v} is not valid for {k}, valid choices: {self[k].choices}')
-                elif isinstance(self[k], Condition):
-                    newdict[k] = Condition(v, self[k].comp)
-
-        newdict._update_comparables(self)
-        return newdict
+        merged = self._clone()
+        stack = [(merged, self, other)]
+        while stack:
+            newdict, base, other = stack.pop()
+            other_annotations = getattr(other, '__annotations__', None)
+            if other_annotations:
+                object.__setattr__(newdict, '__annotations__', {**newdict.__annotations__, **other_annotations})
+            if dict.keys(newdict).isdisjoint(other.keys()):
+                dict.update(newdict, other)
+            else:
+                for k, v in other.items():
+                    if k in newdict:
+                        v = _merge_value(k, dict.__getitem__(newdict, k), v, stack)
+                    dict.__setitem__(newdict, k, v)
+            newdict._resolve_defaults(base, stack)
+        return merged
+
+    def _resolve_defaults(self, base, stack):
+        # Variables that were not overridden fall back to their defaults. Nested
+        # configs holding such variables are copied first so the base configuration
+        # is left untouched, the others are shared.
+        for k, v in dict.items(base):
+            if dict.__getitem__(self, k) is not v:
+                continue
+            if type(v) is Config:
+                if not _has_comparables(v):
+                    continue
+                child = v._clone()
+                dict.__setitem__(self, k, child)
+                stack.append((child, v, {}))
+            elif isinstance(v, Comparable):
+                dict.__setitem__(self, k, v.data)
+
+
+# Named tuple classes created by freeze, keyed by their field names.
+_FROZEN_TYPES = {}
+
+_SKIP = object()
+_MISSING = object()
+
+
+def freeze(config, check=False):
+    """
+    Return a read-only snapshot of a :class:`pipcs.Config` as nested named tuples.
+    The variables are resolved the same way as :meth:`pipcs.Config.to_dict`,
+    names that can't be tuple fields are renamed as with ``namedtuple(..., rename=True)``.
+
+    Args:
+        config (:class:`pipcs.Config`): Configuration to freeze.
+        check (bool): If true, the variables will be checked if they are valid or not.
+
+    .. code-block:: python
+
+        from pipcs import Config, freeze
+
+        config = Config()
+
+        @config('example')
+        class Example():
+            variable: int = 1
+
+        frozen = freeze(config)
+        print(frozen.example.variable)
+        # 1
+    """
+    if check:
+        config.check_config()
+    values = dict(config._cached_dict())
+    for k in values:
+        value = dict.__getitem__(config, k)
+        if isinstance(value, Config):
+            values[k] = freeze(value)
+    fields = tuple(values)
+    try:
+        frozen_type = _FROZEN_TYPES[fields]
+    except KeyError:
+        frozen_type = _FROZEN_TYPES[fields] = namedtuple('FrozenConfig', fields, rename=True)
+    return frozen_type(*values.values())
+
+
+def _merge_value(key, existing, value, stack):
+    """Return what ``value`` becomes when it overrides ``existing`` in Config.update_config.
+    Nested configs are merged later, through ``stack``.
+    """
+    existing_type = type(existing)
+    if existing_type is Config:
+        if isinstance(value, abc.Mapping):
+            child = existing._clone()
+            stack.append((child, existing, value))
+            return child
+    elif existing_type not in _ATOMIC_TYPES:
+        if isinstance(existing, Choices):
+            if not existing._is_choice(value):
+                raise InvalidChoiceError(f'{value} is not valid for {key}, valid choices: {existing.choices}')
+        elif isinstance(existing, Condition):
+            return Condition(value, existing.comp)
+        elif existing_type is dict:
+            existing = existing.copy()
+            existing.update(value)
+            return existing
+        elif isinstance(existing, abc.Mapping):
+            return {**existing, **value}
+    return value
+
+
+def _has_comparables(config):
+    """Return whether ``config`` or a config nested in it holds a :class:`pipcs.Comparable`."""
+    stack = [config]
+    while stack:
+        for value in dict.values(stack.pop()):
+            if type(value) is Config:
+                stack.append(value)
+            elif isinstance(value, Comparable):
+                return True
+    return False
+
+
+def _config_to_dict(config, value):
+    return value._cached_dict()
+
+
+def _comparable_to_dict(config, value):
+    return value.data
+
+
+def _condition_to_dict(config, value):
+    if config._holds(value):
+        return value.data
+    return _SKIP
+
+
+def _check_config_value(config, key, value):
+    value.check_config()
+
+
+def _check_choices_value(config, key, value):
+    if value.data is required:
+        raise RequiredError(f'{key} is required!')
+
+
+def _check_condition_value(config, key, value):
+    if config._holds(value):
+        if value.data is required:
+            raise RequiredError(f'{key} is required!')
+
+
+# Map value types to the functions handling them in Config.to_dict and
+# Config.check_value, None marks plain values.
+_TO_DICT_HANDLERS = {
+    Config: _config_to_dict,
+    Comparable: _comparable_to_dict,
+    Choices: _comparable_to_dict,
+    Condition: _condition_to_dict,
+}
+
+_CHECK_HANDLERS = {
+    Config: _check_config_value,
+    Choices: _check_choices_value,
+    Condition: _check_condition_value,
+}
+
+
+def _find_handler(handlers, value_type):
+    """Resolve the handler of a type missing from ``handlers`` through its MRO and remember it."""
+    handler = None
+    for base in value_type.__mro__:
+        if base in handlers:
+            handler = handlers[base]
+            break
+    handlers[value_type] = handler
+    return handler
+
+
+def _is_class_var(annotation):
+    if isinstance(annotation, str):
+        return (annotation in ('ClassVar', 'typing.ClassVar')
+                or annotation.startswith(('ClassVar[', 'typing.ClassVar[')))
+    return annotation is ClassVar or getattr(annotation, '__origin__', None) is ClassVar
+
+
+def _config_from_class(cls, name, annotations):
+    """Create a :class:`pipcs.Config` from the annotated class attributes of ``cls``.
+    ``dataclasses.field`` defaults are resolved once, the same way a dataclass ``__init__`` would.
+    """
+    namespace = vars(cls)
+    # dataclasses is slow to import and fields can only exist if the user already imported it.
+    dataclasses = sys.modules.get('dataclasses')
+    post_init = '__post_init__' in namespace
+    if post_init:
+        # The hook needs the methods and attributes of the class through self.
+        config = Config.__new__(type(cls.__name__, (Config,), dict(namespace)))
+    else:
+        config = Config.__new__(Config)
+    object.__setattr__(config, '_name', name)
+    for key, annotation in annotations.items():
+        if _is_class_var(annotation):
+            continue
+        value = namespace.get(key, _MISSING)
+        if dataclasses is not None and isinstance(value, dataclasses.Field):
+            if value.default_factory is not dataclasses.MISSING:
+                value = value.default_factory()
+            elif value.default is not dataclasses.MISSING:
+                value = value.default
+            else:
+                value = _MISSING
+        if value is _MISSING:
+            raise TypeError(f'{key} of {cls.__name__} has no default value')
+        dict.__setitem__(config, key, value)
+    object.__setattr__(config, '__annotations__', annotations)
+    if post_init:
+        config.__post_init__()
+        config = Config(config)
+    return config
+
+
+@functools.lru_cache(maxsize=128)
+def _compile_config(config_file, mtime, size):
+    module = os.path.splitext(os.path.basename(config_file))[0]
+    with open(config_file) as f:
+        return compile(f.read(), module, "exec")
 
 
 def read_config(config_file, config_name=None):
     """Read a config from a file. Basically works as `import` but you can load files
-    from different locations by path.
+    from different locations by path. The compiled file is reused until it is modified.
 
     Args:
         config_file (str): File path
@@ -376,10 +719,9 @@ def read_config(config_file, config_name=None):
     base = os.path.basename(config_file)
     module = os.path.splitext(base)[0]
     config = types.ModuleType(module, 'Config')
-    with open(config_file) as f:
-        code = f.read()
-        code = compile(code, module, "exec")
-        exec(code, config.__dict__)
+    stat = os.stat(config_file)
+    code = _compile_config(os.path.abspath(config_file), stat.st_mtime_ns, stat.st_size)
+    exec(code, config.__dict__)
     if config_name is not None:
         return getattr(config, config_name)
     else:
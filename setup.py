@@ -7,6 +7,16 @@ directory = os.path.abspath(os.path.dirname(__file__))
 with open(os.path.join(directory, 'README.md'), encoding='utf-8') as f:
     long_description = f.read()
 
+# Optionally compile the module with Cython, the pure Python module is used otherwise.
+ext_modules = []
+if os.environ.get('PIPCS_CYTHONIZE'):
+    try:
+        from Cython.Build import cythonize
+    except ImportError:
+        pass
+    else:
+        ext_modules = cythonize(['pipcs/pipcs.py'], language_level=3)
+
 setup(name='pipcs',
       version=f'1.3.5',
       description='pipcs is python configuration system',
@@ -17,6 +27,7 @@ setup(name='pipcs',
       long_description_content_type='text/markdown',
       url='https://github.com/goktug97/pipcs',
       packages = ['pipcs'],
+      ext_modules=ext_modules,
       classifiers=[
           "Programming Language :: Python :: 3",
           "License :: OSI Approved :: MIT License"
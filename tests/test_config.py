@@ -1,7 +1,13 @@
+import os
+import pickle
+import tempfile
 import unittest
+from dataclasses import field
+from typing import ClassVar
 
-from pipcs import Config, Choices, Condition, required, Required
+from pipcs import Config, Choices, Condition, required, Required, freeze
 from pipcs import InvalidChoiceError, RequiredError
+from pipcs.pipcs import read_config
 
 class TestChoices(unittest.TestCase):
     def setUp(self):
@@ -43,6 +49,10 @@ class TestChoices(unittest.TestCase):
         self.assertEqual(config['test']['variable1'], required)
         self.assertEqual(config['test']['variable2'], 1)
 
+    def test_hash(self):
+        variable = self.config.test.variable1
+        self.assertIn(variable, {variable})
+
     def test_invalid_choices(self):
         config = Config(self.config)
         with self.assertRaises(InvalidChoiceError):
@@ -50,6 +60,27 @@ class TestChoices(unittest.TestCase):
             class Test():
                 variable1 = 4
 
+    def test_unhashable_choices(self):
+        config = Config()
+        @config('test')
+        class Test():
+            variable: Choices[list] = Choices([[1], [2]], default=[1])
+        config2 = Config(config)
+        @config2('test')
+        class Test2():
+            variable = [2]
+        self.assertEqual(config2.test.variable, [2])
+        config3 = Config(config)
+        with self.assertRaises(InvalidChoiceError):
+            @config3('test')
+            class Test3():
+                variable = [3]
+        config3 = Config(config)
+        with self.assertRaises(InvalidChoiceError):
+            @config3('test')
+            class Test4():
+                variable = {3}
+
 
 class TestCondition(unittest.TestCase):
     def setUp(self):
@@ -91,6 +122,11 @@ class TestCondition(unittest.TestCase):
         self.assertTrue('conditional_variable2' in self.user_config2.test.to_dict())
         self.assertFalse('conditional_variable2' in self.user_config1.test.to_dict())
 
+    def test_condition_after_change(self):
+        self.assertTrue('conditional_variable2' in self.user_config2.test.to_dict())
+        self.user_config2.test.variable1 = 1
+        self.assertFalse('conditional_variable2' in self.user_config2.test.to_dict())
+
     def test_required_error(self):
         with self.assertRaises(RequiredError):
             self.config.to_dict(check=True)
@@ -159,6 +195,21 @@ class TestCondition(unittest.TestCase):
         self.assertTrue('conditional_variable5' in config.test.to_dict())
         self.assertFalse('conditional_variable6' in config.test.to_dict())
 
+    def test_compare_variables(self):
+        config = Config()
+        @config('test')
+        class Test():
+            variable1: Choices[int] = Choices([1, 2], default=1)
+            variable2: Choices[int] = Choices([1, 2], default=1)
+            conditional_variable: Condition[int] = Condition(1, variable1 == variable2)
+        self.assertTrue('conditional_variable' in config.test.to_dict())
+
+        user_config = Config(config)
+        @user_config('test')
+        class Test():
+            variable2 = 2
+        self.assertFalse('conditional_variable' in user_config.test.to_dict())
+
 
 class TestRequired(unittest.TestCase):
     def setUp(self):
@@ -182,6 +233,16 @@ class TestRequired(unittest.TestCase):
         except RequiredError:
             self.fail('Raised RequiredError')
 
+    def test_check_after_change(self):
+        config = Config(self.config)
+        @config('test')
+        class Test():
+            required_variable = 1
+        config.check_config()
+        config.test.required_variable = required
+        with self.assertRaises(RequiredError):
+            config.check_config()
+
     def test_to_dict(self):
         with self.assertRaises(RequiredError):
             self.config.to_dict(check=True)
@@ -206,6 +267,9 @@ class TestConfig(unittest.TestCase):
         with self.assertRaises(AttributeError):
             self.config.missing_config
 
+        self.assertFalse(hasattr(self.config, 'missing_config'))
+        self.assertNotIn('missing_config', self.config)
+
     def test_get_value(self):
         self.config.get_value('test', check=True)
 
@@ -243,3 +307,145 @@ class TestConfig(unittest.TestCase):
         self.assertTrue(hasattr(config.test, 'choice_variable2'))
         self.assertTrue(isinstance(config.test.choice_variable2, Choices))
 
+    def test_update_keeps_base(self):
+        config = Config()
+        @config('test')
+        class Test():
+            variable: int = 1
+        @config.test('nested')
+        class Nested():
+            choice_variable: Choices[int] = Choices([1, 2, 3], default=1)
+
+        user_config = Config(config)
+        @user_config('test')
+        class Test():
+            variable = 2
+        self.assertEqual(user_config.test.nested.choice_variable, 1)
+        self.assertTrue(isinstance(config.test.nested.choice_variable, Choices))
+
+    def test_update_shares_plain_subtree(self):
+        config = Config()
+        @config('test')
+        class Test():
+            variable: int = 1
+        @config.test('nested')
+        class Nested():
+            variable: int = 1
+
+        user_config = Config(config)
+        @user_config('test')
+        class Test():
+            variable = 2
+        self.assertIs(user_config.test.nested, config.test.nested)
+
+    def test_to_dict_cache(self):
+        config = self.config.to_dict()
+        self.assertEqual(self.config.to_dict(), config)
+        self.assertIsNot(self.config.to_dict(), config)
+        self.config.test.variable = 2
+        config = self.config.to_dict()
+        self.assertEqual(config['test']['variable'], 2)
+
+    def test_to_dict_mutation(self):
+        config = self.config.test.to_dict()
+        config.pop('variable')
+        self.assertEqual(self.config.to_dict()['test']['variable'], 1)
+        config = self.config.to_dict()
+        config['test']['variable'] = 3
+        self.assertEqual(self.config.test.to_dict()['variable'], 1)
+        self.assertEqual(freeze(self.config).test.variable, 1)
+
+    def test_pickle(self):
+        self.config.to_dict(check=True)
+        self.config.test.to_dict()
+        config = pickle.loads(pickle.dumps(self.config))
+        for key in ('_dict_cache', '_checked_version', '_condition_cache'):
+            self.assertNotIn(key, vars(config.test))
+        self.assertEqual(config.test._name, 'test')
+        config.test.variable = 2
+        self.assertEqual(config.to_dict()['test']['variable'], 2)
+
+    def test_default_factory(self):
+        config = Config(self.config)
+        @config('test')
+        class Test():
+            list_variable: list = field(default_factory=lambda: [1, 2])
+        self.assertEqual(config.test.list_variable, [1, 2])
+
+    def test_post_init(self):
+        config = Config()
+        @config('test')
+        class Test():
+            variable: int = 1
+            def helper(self):
+                return self.get_value('variable') + 1
+            def __post_init__(self):
+                self.variable2 = self.helper()
+        self.assertIs(type(config.test), Config)
+        self.assertEqual(config.test.to_dict(), {'variable': 1, 'variable2': 2})
+
+    def test_freeze(self):
+        frozen = freeze(self.config)
+        self.assertEqual(frozen.test.variable, 1)
+        self.assertEqual(frozen.test.choice_variable, 1)
+        with self.assertRaises(AttributeError):
+            frozen.test.variable = 2
+
+    def test_freeze_variable(self):
+        config = Config()
+        @config('test')
+        class Test():
+            freeze: bool = False
+        self.assertIs(config.test.freeze, False)
+        self.assertIs(freeze(config).test.freeze, False)
+
+    def test_class_var(self):
+        config = Config()
+        @config('test')
+        class Test():
+            class_variable: ClassVar[int] = 1
+            variable: int = 2
+        self.assertEqual(config.test.to_dict(), {'variable': 2})
+
+    def test_string_class_var(self):
+        config = Config()
+        @config('test')
+        class Test():
+            class_variable: 'ClassVar[int]' = 1
+            typing_class_variable: 'typing.ClassVar' = 2
+            variable: 'ClassVariable' = 3
+        self.assertEqual(config.test.to_dict(), {'variable': 3})
+
+    def test_annotations(self):
+        config = Config()
+        @config('test')
+        class Test():
+            variable: int = 1
+        config2 = Config(config)
+        @config2('test')
+        class Test2():
+            variable = 2
+            variable2: str = 'a'
+        self.assertEqual(list(config2.test.keys()), ['variable', 'variable2'])
+        self.assertEqual(config2.test.__annotations__,
+                         {'variable': int, 'variable2': str})
+        self.assertEqual(config.test.__annotations__, {'variable': int})
+
+
+class TestReadConfig(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'user_config.py')
+        with open(self.path, 'w') as f:
+            f.write('variable = 1\n')
+
+    def test_read(self):
+        self.assertEqual(read_config(self.path, 'variable'), 1)
+        self.assertEqual(read_config(self.path).variable, 1)
+
+    def test_modified(self):
+        self.assertEqual(read_config(self.path, 'variable'), 1)
+        with open(self.path, 'w') as f:
+            f.write('variable = 22\n')
+        self.assertEqual(read_config(self.path, 'variable'), 22)